@@ -70,6 +70,9 @@ class ClassAwareSamplingRoiDbSource(RoiDbSource):
             mixup_epoch=mixup_epoch,
             with_background=with_background)
         self._img_weights = None
+        self._img_weights_cdf = None
+        self._sampled_pos = None
+        self._sampled_idx = 0
 
     def __str__(self):
         return 'ClassAwareSamplingRoidbSource(fname:%s,epoch:%d,size:%d)' \
@@ -81,8 +84,11 @@ class ClassAwareSamplingRoiDbSource(RoiDbSource):
         if self._epoch < 0:
             self.reset()
 
-        _pos = np.random.choice(
-            self._samples, 1, replace=False, p=self._img_weights)[0]
+        if self._sampled_idx >= len(self._sampled_pos):
+            self._sampled_pos = self._sample_pos(self._samples)
+            self._sampled_idx = 0
+        _pos = int(self._sampled_pos[self._sampled_idx])
+        self._sampled_idx += 1
         sample = copy.deepcopy(self._roidb[_pos])
 
         if self._load_img:
@@ -92,27 +98,29 @@ class ClassAwareSamplingRoiDbSource(RoiDbSource):
 
         return sample
 
+    def _sample_pos(self, num):
+        """ draw num sample positions according to the image weights
+        """
+        # inverse transform sampling on the precomputed cdf, equivalent
+        # to np.random.choice with p=self._img_weights but O(log N)
+        pos = np.searchsorted(
+            self._img_weights_cdf, np.random.uniform(0, 1, num), side='right')
+        return np.minimum(pos, self._samples - 1)
+
     def _calc_img_weights(self):
         """ calculate the probabilities of each sample
         """
-        imgs_cls = []
-        num_per_cls = {}
-        img_weights = []
-        for i, roidb in enumerate(self._roidb):
-            img_cls = set(
-                [k for cls in self._roidb[i]['gt_class'] for k in cls])
-            imgs_cls.append(img_cls)
-            for c in img_cls:
-                if c not in num_per_cls:
-                    num_per_cls[c] = 1
-                else:
-                    num_per_cls[c] += 1
-
-        for i in range(len(self._roidb)):
-            weights = 0
-            for c in imgs_cls[i]:
-                weights += 1 / num_per_cls[c]
-            img_weights.append(weights)
+        imgs_cls = [np.unique(roidb['gt_class']) for roidb in self._roidb]
+        img_ids = np.repeat(
+            np.arange(len(imgs_cls)), [len(c) for c in imgs_cls])
+        _, cls_ids, num_per_cls = np.unique(
+            np.concatenate(imgs_cls), return_inverse=True, return_counts=True)
+        # weight of an image is the sum of 1 / (images of class c)
+        # over the distinct classes c it contains
+        img_weights = np.bincount(
+            img_ids,
+            weights=1. / num_per_cls[cls_ids],
+            minlength=len(imgs_cls))
         # Probabilities sum to 1
         img_weights = img_weights / np.sum(img_weights)
         return img_weights
@@ -125,8 +133,11 @@ class ClassAwareSamplingRoiDbSource(RoiDbSource):
 
         if self._img_weights is None:
             self._img_weights = self._calc_img_weights()
+            self._img_weights_cdf = np.cumsum(self._img_weights)
 
         self._samples = len(self._roidb)
+        self._sampled_pos = self._sample_pos(self._samples)
+        self._sampled_idx = 0
 
         if self._epoch < 0:
             self._epoch = 0
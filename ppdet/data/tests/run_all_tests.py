@@ -19,6 +19,7 @@
 import unittest
 import test_loader
 import test_operator
+import test_op_helper
 import test_roidb_source
 import test_iterator_source
 import test_transformer
@@ -30,6 +31,8 @@ if __name__ == '__main__':
         for t in [
             test_loader.TestLoader,
             test_operator.TestBase,
+            test_operator.TestRandomDistort,
+            test_op_helper.TestOpHelper,
             test_roidb_source.TestRoiDbSource,
             test_iterator_source.TestIteratorSource,
             test_transformer.TestTransformer,
@@ -0,0 +1,200 @@
+#   Copyright (c) 2019 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import unittest
+import numpy as np
+import set_env
+from ppdet.data.transform.op_helper import (
+    generate_sample_bboxes, iou_matrix, satisfy_sample_constraints,
+    satisfy_sample_constraint_coverage)
+
+
+def jaccard_overlap(sample_bbox, object_bbox):
+    """reference per box jaccard overlap"""
+    if sample_bbox[0] >= object_bbox[2] or \
+        sample_bbox[2] <= object_bbox[0] or \
+        sample_bbox[1] >= object_bbox[3] or \
+        sample_bbox[3] <= object_bbox[1]:
+        return 0
+    intersect_xmin = max(sample_bbox[0], object_bbox[0])
+    intersect_ymin = max(sample_bbox[1], object_bbox[1])
+    intersect_xmax = min(sample_bbox[2], object_bbox[2])
+    intersect_ymax = min(sample_bbox[3], object_bbox[3])
+    intersect_size = (intersect_xmax - intersect_xmin) * (
+        intersect_ymax - intersect_ymin)
+    sample_bbox_size = (sample_bbox[2] - sample_bbox[0]) * (
+        sample_bbox[3] - sample_bbox[1])
+    object_bbox_size = (object_bbox[2] - object_bbox[0]) * (
+        object_bbox[3] - object_bbox[1])
+    overlap = intersect_size / (
+        sample_bbox_size + object_bbox_size - intersect_size)
+    return overlap
+
+
+def satisfy_sample_constraint(sampler,
+                              sample_bbox,
+                              gt_bboxes,
+                              satisfy_all=False):
+    """reference per box sample constraint"""
+    if sampler[6] == 0 and sampler[7] == 0:
+        return True
+    satisfied = []
+    for i in range(len(gt_bboxes)):
+        overlap = jaccard_overlap(sample_bbox, gt_bboxes[i])
+        if sampler[6] != 0 and overlap < sampler[6]:
+            satisfied.append(False)
+            continue
+        if sampler[7] != 0 and overlap > sampler[7]:
+            satisfied.append(False)
+            continue
+        satisfied.append(True)
+        if not satisfy_all:
+            return True
+    if satisfy_all:
+        return np.all(satisfied)
+    return False
+
+
+def bbox_coverage(bbox1, bbox2):
+    """reference per box coverage of bbox1 by bbox2"""
+    if bbox2[0] > bbox1[2] or bbox2[2] < bbox1[0] or \
+        bbox2[1] > bbox1[3] or bbox2[3] < bbox1[1]:
+        return 0.
+    intersect_size = (min(bbox1[2], bbox2[2]) - max(bbox1[0], bbox2[0])) * (
+        min(bbox1[3], bbox2[3]) - max(bbox1[1], bbox2[1]))
+    if intersect_size > 0:
+        return intersect_size / ((bbox1[2] - bbox1[0]) *
+                                 (bbox1[3] - bbox1[1]))
+    return 0.
+
+
+def satisfy_sample_constraint_coverage_ref(sampler, sample_bbox, gt_bboxes):
+    """reference per box sample constraint with object coverage"""
+    has_jaccard_overlap = sampler[6] != 0 or sampler[7] != 0
+    has_object_coverage = sampler[8] != 0 or sampler[9] != 0
+    if not has_jaccard_overlap and not has_object_coverage:
+        return True
+    found = False
+    for i in range(len(gt_bboxes)):
+        if has_jaccard_overlap:
+            overlap = jaccard_overlap(sample_bbox, gt_bboxes[i])
+            if sampler[6] != 0 and overlap < sampler[6]:
+                continue
+            if sampler[7] != 0 and overlap > sampler[7]:
+                continue
+            found = True
+        if has_object_coverage:
+            object_coverage = bbox_coverage(gt_bboxes[i], sample_bbox)
+            if sampler[8] != 0 and object_coverage < sampler[8]:
+                continue
+            if sampler[9] != 0 and object_coverage > sampler[9]:
+                continue
+            found = True
+        if found:
+            return True
+    return found
+
+
+def random_bboxes(num):
+    tl = np.random.uniform(0, 0.8, (num, 2))
+    wh = np.random.uniform(0.05, 0.5, (num, 2))
+    return np.hstack([tl, np.minimum(tl + wh, 1.)])
+
+
+class TestOpHelper(unittest.TestCase):
+    """Test the vectorized bbox sampling helpers against
+    their per box counterparts
+    """
+
+    def setUp(self):
+        np.random.seed(0)
+        self.samplers = [[1, 50, 0.3, 1.0, 0.5, 2.0, 0.0, 0.0],
+                         [1, 50, 0.3, 1.0, 0.5, 2.0, 0.1, 0.0],
+                         [1, 50, 0.3, 1.0, 0.5, 2.0, 0.5, 0.0],
+                         [1, 50, 0.3, 1.0, 0.5, 2.0, 0.9, 0.0],
+                         [1, 50, 0.3, 1.0, 0.5, 2.0, 0.0, 0.3],
+                         [8, 50, 0.3, 1.0, 0.5, 2.0, 0.1, 0.7]]
+
+    def test_generate_sample_bboxes(self):
+        for sampler in self.samplers:
+            bboxes = generate_sample_bboxes(sampler, sampler[1])
+            self.assertEqual(bboxes.shape, (sampler[1], 4))
+            self.assertTrue((bboxes >= -1e-6).all())
+            self.assertTrue((bboxes <= 1 + 1e-6).all())
+            wh = bboxes[:, 2:] - bboxes[:, :2]
+            self.assertTrue((wh > 0).all())
+            scale = np.sqrt(wh[:, 0] * wh[:, 1])
+            self.assertTrue((scale >= sampler[2] - 1e-6).all())
+            self.assertTrue((scale <= sampler[3] + 1e-6).all())
+
+    def test_iou_matrix(self):
+        a = random_bboxes(20)
+        b = random_bboxes(30)
+        overlap = iou_matrix(a, b)
+        self.assertEqual(overlap.shape, (20, 30))
+        expect = [[jaccard_overlap(x, y) for y in b] for x in a]
+        self.assertTrue(np.allclose(overlap, expect))
+
+    def test_satisfy_sample_constraints(self):
+        for num_gt in [0, 1, 5]:
+            gt_bboxes = random_bboxes(num_gt)
+            for sampler in self.samplers:
+                bboxes = generate_sample_bboxes(sampler, sampler[1])
+                for satisfy_all in [False, True]:
+                    satisfied = satisfy_sample_constraints(
+                        sampler, bboxes, gt_bboxes, satisfy_all)
+                    expect = [
+                        satisfy_sample_constraint(sampler, bbox, gt_bboxes,
+                                                  satisfy_all)
+                        for bbox in bboxes
+                    ]
+                    self.assertEqual(satisfied.tolist(), expect)
+
+    def test_sample_selection(self):
+        gt_bboxes = random_bboxes(3)
+        for sampler in self.samplers:
+            bboxes = generate_sample_bboxes(sampler, sampler[1])
+            for satisfy_all in [False, True]:
+                # as CropImage selects from all trials at once
+                satisfied = satisfy_sample_constraints(
+                    sampler, bboxes, gt_bboxes, satisfy_all)
+                selected = bboxes[satisfied][:sampler[0]].tolist()
+                # the sequential loop it replaces
+                expect = []
+                for bbox in bboxes:
+                    if len(expect) >= sampler[0]:
+                        break
+                    if satisfy_sample_constraint(sampler, bbox, gt_bboxes,
+                                                 satisfy_all):
+                        expect.append(bbox.tolist())
+                self.assertEqual(selected, expect)
+
+    def test_satisfy_sample_constraint_coverage(self):
+        samplers = [[1, 50, 0.3, 1.0, 0.5, 2.0, 0.0, 0.0, 0.0, 0.0],
+                    [1, 50, 0.3, 1.0, 0.5, 2.0, 0.3, 0.0, 0.0, 0.0],
+                    [1, 50, 0.3, 1.0, 0.5, 2.0, 0.0, 0.0, 0.5, 0.0],
+                    [1, 50, 0.3, 1.0, 0.5, 2.0, 0.0, 0.0, 0.0, 0.8],
+                    [1, 50, 0.3, 1.0, 0.5, 2.0, 0.1, 0.7, 0.3, 1.0]]
+        for num_gt in [0, 1, 5]:
+            gt_bboxes = random_bboxes(num_gt)
+            for sampler in samplers:
+                for bbox in generate_sample_bboxes(sampler, sampler[1]):
+                    self.assertEqual(
+                        satisfy_sample_constraint_coverage(sampler, bbox,
+                                                           gt_bboxes),
+                        satisfy_sample_constraint_coverage_ref(
+                            sampler, bbox, gt_bboxes))
+
+
+if __name__ == '__main__':
+    unittest.main()
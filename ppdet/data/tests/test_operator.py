@@ -15,8 +15,10 @@ import os
 import unittest
 import logging
 import numpy as np
+import cv2
 import set_env
 import ppdet.data.transform as tf
+from ppdet.data.transform.operators import RandomDistort
 logging.basicConfig(level=logging.INFO)
 
 
@@ -152,5 +154,156 @@ class TestBase(unittest.TestCase):
         #self.assertGreater(result['gt_score'].shape[0], 0)
 
 
+class TestRandomDistort(unittest.TestCase):
+    """Test RandomDistort against applying each distortion in turn,
+    the fused affine of brightness, contrast and saturation is only
+    clipped once, hue is compared with a plain HSV hue shift
+    """
+
+    def setUp(self):
+        np.random.seed(0)
+        # unclipped float image, all distortions are exact in this range
+        self.img = np.random.uniform(64, 192, (8, 8, 3))
+        self.deltas = {
+            'brightness': 1.2,
+            'contrast': 0.7,
+            'saturation': 1.3,
+            'hue': 10.,
+        }
+        d = self.deltas
+        self.op = RandomDistort(
+            brightness_lower=d['brightness'],
+            brightness_upper=d['brightness'],
+            contrast_lower=d['contrast'],
+            contrast_upper=d['contrast'],
+            saturation_lower=d['saturation'],
+            saturation_upper=d['saturation'],
+            hue_lower=d['hue'],
+            hue_upper=d['hue'],
+            brightness_prob=1.,
+            contrast_prob=1.,
+            saturation_prob=1.,
+            hue_prob=1.)
+
+    def _gray(self, img):
+        return np.dot(img, [0.299, 0.587, 0.114])
+
+    def _brightness(self, img):
+        return img * self.deltas['brightness']
+
+    def _contrast(self, img):
+        d = self.deltas['contrast']
+        gray_mean = self._gray(img.reshape(-1, 3).mean(axis=0))
+        return img * d + gray_mean * (1 - d)
+
+    def _saturation(self, img):
+        d = self.deltas['saturation']
+        return img * d + self._gray(img)[..., np.newaxis] * (1 - d)
+
+    def _hue(self, img):
+        img = np.clip(np.rint(img), 0, 255).astype(np.uint8)
+        hsv = cv2.cvtColor(img, cv2.COLOR_RGB2HSV_FULL).astype(np.int64)
+        hsv[..., 0] = (hsv[..., 0] + int(self.deltas['hue'])) % 256
+        return cv2.cvtColor(
+            hsv.astype(np.uint8), cv2.COLOR_HSV2RGB_FULL).astype(np.float64)
+
+    def _clipped(self, ops):
+        # each step saturated to uint8, as the former PIL implementation
+        img = self.img
+        for op in ops:
+            img = np.clip(np.rint(op(img)), 0, 255)
+        return img
+
+    def _fused(self, ops):
+        img, mat, bias = self.img, np.eye(3), np.zeros(3)
+        for op in ops:
+            img, mat, bias = op(img, mat, bias)
+        return np.dot(img, mat.T) + bias
+
+    def _sequential(self, ops):
+        img = self.img
+        for op in ops:
+            img = op(img)
+        return img
+
+    def test_default_order(self):
+        op = self.op
+        fused = self._fused([
+            op.random_brightness, op.random_contrast, op.random_saturation
+        ])
+        expect = self._sequential(
+            [self._brightness, self._contrast, self._saturation])
+        self.assertTrue(np.allclose(fused, expect, atol=1e-6))
+
+    def test_alternative_order(self):
+        op = self.op
+        fused = self._fused([
+            op.random_brightness, op.random_saturation, op.random_contrast
+        ])
+        expect = self._sequential(
+            [self._brightness, self._saturation, self._contrast])
+        self.assertTrue(np.allclose(fused, expect, atol=1e-6))
+
+    def test_hue_shift(self):
+        self.op.brightness_prob = 0.
+        self.op.contrast_prob = 0.
+        self.op.saturation_prob = 0.
+        # saturated colors all around the hue circle
+        hsv = np.stack(
+            [
+                np.arange(256).reshape(16, 16), np.full((16, 16), 200),
+                np.full((16, 16), 220)
+            ],
+            axis=2).astype(np.uint8)
+        img = cv2.cvtColor(hsv, cv2.COLOR_HSV2RGB_FULL)
+        for delta in [10., -18., 60.]:
+            self.op.hue_lower = self.op.hue_upper = delta
+            result = self.op({'image': img.copy()}, None)['image']
+            shifted = cv2.cvtColor(result, cv2.COLOR_RGB2HSV_FULL)
+            src = cv2.cvtColor(img, cv2.COLOR_RGB2HSV_FULL)
+            diff = (shifted[..., 0].astype(np.int64) - src[..., 0] -
+                    int(delta)) % 256
+            diff = np.minimum(diff, 256 - diff)
+            self.assertLessEqual(diff.max(), 2)
+            self.deltas['hue'] = delta
+            expect = self._hue(img.astype(np.float64))
+            self.assertLessEqual(np.abs(result - expect).max(), 2)
+
+    def test_hue_direction(self):
+        red = np.array([[[200, 40, 40]]], dtype=np.uint8)
+        sample = {'image': red.copy()}
+        self.op.brightness_prob = 0.
+        self.op.contrast_prob = 0.
+        self.op.saturation_prob = 0.
+        result = self.op(sample, None)['image']
+        hue = cv2.cvtColor(result, cv2.COLOR_RGB2HSV_FULL)[0, 0, 0]
+        # positive hue_delta moves red towards yellow in HSV
+        self.assertTrue(0 < hue < 2 * self.deltas['hue'])
+
+    def test_call(self):
+        self.op.is_order = True
+        img = self.img.astype(np.uint8)
+        self.img = img.astype(np.float64)
+        expects = [
+            self._clipped([
+                self._brightness, self._contrast, self._saturation, self._hue
+            ]), self._clipped([
+                self._brightness, self._saturation, self._hue, self._contrast
+            ])
+        ]
+        for seed in range(4):
+            # the first draw picks the order
+            np.random.seed(seed)
+            order = int(np.random.uniform(0, 1) < 0.5)
+            np.random.seed(seed)
+            result = self.op({'image': img.copy()}, None)['image']
+            self.assertEqual(result.dtype, np.uint8)
+            # the uint8 HSV round trip amplifies rounding differences of
+            # its input by a few levels on low saturated pixels
+            diff = np.abs(result - expects[order])
+            self.assertLessEqual(diff.max(), 5)
+            self.assertLess(diff.mean(), 1)
+
+
 if __name__ == '__main__':
     unittest.main()
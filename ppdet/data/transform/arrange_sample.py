@@ -309,9 +309,11 @@ class ArrangeYOLO(BaseOperator):
             gt_bbox[:gt_num, :] = sample['gt_bbox'][:gt_num, :]
             gt_class[:gt_num] = sample['gt_class'][:gt_num, 0]
             gt_score[:gt_num] = sample['gt_score'][:gt_num, 0]
-        # parse [x1, y1, x2, y2] to [x, y, w, h]
-        gt_bbox[:, 2:4] = gt_bbox[:, 2:4] - gt_bbox[:, :2]
-        gt_bbox[:, :2] = gt_bbox[:, :2] + gt_bbox[:, 2:4] / 2.
+            # parse [x1, y1, x2, y2] to [x, y, w, h] in place, the padded
+            # rows are all zeros and stay so
+            valid_bbox = gt_bbox[:gt_num]
+            valid_bbox[:, 2:4] -= valid_bbox[:, :2]
+            valid_bbox[:, :2] += valid_bbox[:, 2:4] / 2.
         outs = (im, gt_bbox, gt_class, gt_score)
         return outs
 
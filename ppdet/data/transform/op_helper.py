@@ -110,21 +110,19 @@ def bbox_area_sampling(bboxes, labels, scores, target_size, min_size):
     return bboxes, labels, scores
 
 
-def generate_sample_bbox(sampler):
-    scale = np.random.uniform(sampler[2], sampler[3])
-    aspect_ratio = np.random.uniform(sampler[4], sampler[5])
-    aspect_ratio = max(aspect_ratio, (scale**2.0))
-    aspect_ratio = min(aspect_ratio, 1 / (scale**2.0))
+def generate_sample_bboxes(sampler, num):
+    """draw num bboxes of a sampler at once, returns a (num, 4) array"""
+    scale = np.random.uniform(sampler[2], sampler[3], num)
+    aspect_ratio = np.random.uniform(sampler[4], sampler[5], num)
+    aspect_ratio = np.maximum(aspect_ratio, scale**2.0)
+    aspect_ratio = np.minimum(aspect_ratio, 1 / (scale**2.0))
     bbox_width = scale * (aspect_ratio**0.5)
     bbox_height = scale / (aspect_ratio**0.5)
-    xmin_bound = 1 - bbox_width
-    ymin_bound = 1 - bbox_height
-    xmin = np.random.uniform(0, xmin_bound)
-    ymin = np.random.uniform(0, ymin_bound)
+    xmin = np.random.uniform(0, 1 - bbox_width)
+    ymin = np.random.uniform(0, 1 - bbox_height)
     xmax = xmin + bbox_width
     ymax = ymin + bbox_height
-    sampled_bbox = [xmin, ymin, xmax, ymax]
-    return sampled_bbox
+    return np.stack([xmin, ymin, xmax, ymax], axis=1)
 
 
 def generate_sample_bbox_square(sampler, image_width, image_height):
@@ -233,76 +231,41 @@ def data_anchor_sampling(bbox_labels, image_width, image_height, scale_array,
         return 0
 
 
-def jaccard_overlap(sample_bbox, object_bbox):
-    if sample_bbox[0] >= object_bbox[2] or \
-        sample_bbox[2] <= object_bbox[0] or \
-        sample_bbox[1] >= object_bbox[3] or \
-        sample_bbox[3] <= object_bbox[1]:
-        return 0
-    intersect_xmin = max(sample_bbox[0], object_bbox[0])
-    intersect_ymin = max(sample_bbox[1], object_bbox[1])
-    intersect_xmax = min(sample_bbox[2], object_bbox[2])
-    intersect_ymax = min(sample_bbox[3], object_bbox[3])
-    intersect_size = (intersect_xmax - intersect_xmin) * (
-        intersect_ymax - intersect_ymin)
-    sample_bbox_size = bbox_area(sample_bbox)
-    object_bbox_size = bbox_area(object_bbox)
-    overlap = intersect_size / (
-        sample_bbox_size + object_bbox_size - intersect_size)
-    return overlap
-
-
-def intersect_bbox(bbox1, bbox2):
-    if bbox2[0] > bbox1[2] or bbox2[2] < bbox1[0] or \
-        bbox2[1] > bbox1[3] or bbox2[3] < bbox1[1]:
-        intersection_box = [0.0, 0.0, 0.0, 0.0]
-    else:
-        intersection_box = [
-            max(bbox1[0], bbox2[0]), max(bbox1[1], bbox2[1]),
-            min(bbox1[2], bbox2[2]), min(bbox1[3], bbox2[3])
-        ]
-    return intersection_box
-
+def intersect_area(a, b):
+    """pairwise intersection area of boxes a (N, 4) and b (M, 4) -> (N, M)"""
+    tl_i = np.maximum(a[:, np.newaxis, :2], b[:, :2])
+    br_i = np.minimum(a[:, np.newaxis, 2:], b[:, 2:])
+    return np.prod(np.clip(br_i - tl_i, 0, None), axis=2)
 
-def bbox_coverage(bbox1, bbox2):
-    inter_box = intersect_bbox(bbox1, bbox2)
-    intersect_size = bbox_area(inter_box)
 
-    if intersect_size > 0:
-        bbox1_size = bbox_area(bbox1)
-        return intersect_size / bbox1_size
-    else:
-        return 0.
+def iou_matrix(a, b):
+    """pairwise jaccard overlap of boxes a (N, 4) and b (M, 4) -> (N, M)"""
+    area_i = intersect_area(a, b)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    area_o = area_a[:, np.newaxis] + area_b - area_i
+    return area_i / (area_o + 1e-10)
 
 
-def satisfy_sample_constraint(sampler,
-                              sample_bbox,
-                              gt_bboxes,
-                              satisfy_all=False):
+def satisfy_sample_constraints(sampler,
+                               sample_bboxes,
+                               gt_bboxes,
+                               satisfy_all=False):
+    """check the overlap constraint of a sampler for a (num, 4) array of
+    sampled bboxes, returns a boolean mask of shape (num, )"""
+    num = sample_bboxes.shape[0]
     if sampler[6] == 0 and sampler[7] == 0:
-        return True
-    satisfied = []
-    for i in range(len(gt_bboxes)):
-        object_bbox = [
-            gt_bboxes[i][0], gt_bboxes[i][1], gt_bboxes[i][2], gt_bboxes[i][3]
-        ]
-        overlap = jaccard_overlap(sample_bbox, object_bbox)
-        if sampler[6] != 0 and \
-                overlap < sampler[6]:
-            satisfied.append(False)
-            continue
-        if sampler[7] != 0 and \
-                overlap > sampler[7]:
-            satisfied.append(False)
-            continue
-        satisfied.append(True)
-        if not satisfy_all:
-            return True
-
+        return np.ones((num, ), dtype=bool)
+    gt_bboxes = np.asarray(gt_bboxes).reshape(-1, 4)
+    overlap = iou_matrix(gt_bboxes, sample_bboxes)
+    satisfied = np.ones(overlap.shape, dtype=bool)
+    if sampler[6] != 0:
+        satisfied &= overlap >= sampler[6]
+    if sampler[7] != 0:
+        satisfied &= overlap <= sampler[7]
     if satisfy_all:
-        return np.all(satisfied)
-    else:
-        return False
+        return satisfied.all(axis=0)
+    return satisfied.any(axis=0)
 
 
 def satisfy_sample_constraint_coverage(sampler, sample_bbox, gt_bboxes):
@@ -317,32 +280,28 @@ def satisfy_sample_constraint_coverage(sampler, sample_bbox, gt_bboxes):
 
     if not has_jaccard_overlap and not has_object_coverage:
         return True
-    found = False
-    for i in range(len(gt_bboxes)):
-        object_bbox = [
-            gt_bboxes[i][0], gt_bboxes[i][1], gt_bboxes[i][2], gt_bboxes[i][3]
-        ]
-        if has_jaccard_overlap:
-            overlap = jaccard_overlap(sample_bbox, object_bbox)
-            if sampler[6] != 0 and \
-                    overlap < sampler[6]:
-                continue
-            if sampler[7] != 0 and \
-                    overlap > sampler[7]:
-                continue
-            found = True
-        if has_object_coverage:
-            object_coverage = bbox_coverage(object_bbox, sample_bbox)
-            if sampler[8] != 0 and \
-                    object_coverage < sampler[8]:
-                continue
-            if sampler[9] != 0 and \
-                    object_coverage > sampler[9]:
-                continue
-            found = True
-        if found:
-            return True
-    return found
+    gt_bboxes = np.asarray(gt_bboxes).reshape(-1, 4)
+    sample_bbox = np.asarray(sample_bbox).reshape(-1, 4)
+    # checked against all gt boxes at once; as with the former per-box
+    # loop, a box meeting the jaccard constraint is sufficient, so the
+    # coverage constraint only matters when there is no jaccard one
+    if has_jaccard_overlap:
+        overlap = iou_matrix(gt_bboxes, sample_bbox)[:, 0]
+        satisfied = np.ones(overlap.shape, dtype=bool)
+        if sampler[6] != 0:
+            satisfied &= overlap >= sampler[6]
+        if sampler[7] != 0:
+            satisfied &= overlap <= sampler[7]
+        return bool(satisfied.any())
+    area_i = intersect_area(gt_bboxes, sample_bbox)[:, 0]
+    area_gt = np.prod(gt_bboxes[:, 2:] - gt_bboxes[:, :2], axis=1)
+    object_coverage = area_i / np.maximum(area_gt, 1e-10)
+    satisfied = np.ones(object_coverage.shape, dtype=bool)
+    if sampler[8] != 0:
+        satisfied &= object_coverage >= sampler[8]
+    if sampler[9] != 0:
+        satisfied &= object_coverage <= sampler[9]
+    return bool(satisfied.any())
 
 
 def crop_image_sampling(img, sample_bbox, image_width, image_height,
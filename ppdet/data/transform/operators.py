@@ -26,12 +26,12 @@ import random
 import math
 import numpy as np
 import cv2
-from PIL import Image, ImageEnhance
+from PIL import Image
 
 from ppdet.core.workspace import serializable
 
-from .op_helper import (satisfy_sample_constraint, filter_and_process,
-                        generate_sample_bbox, clip_bbox, data_anchor_sampling,
+from .op_helper import (satisfy_sample_constraints, filter_and_process,
+                        generate_sample_bboxes, clip_bbox, data_anchor_sampling,
                         satisfy_sample_constraint_coverage, crop_image_sampling,
                         generate_sample_bbox_square, bbox_area_sampling)
 
@@ -39,6 +39,9 @@ logger = logging.getLogger(__name__)
 
 registered_ops = []
 
+# ITU-R 601-2 luma transform, as used by PIL for RGB to L conversion
+GRAY_COEF = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
 
 def register_op(cls):
     registered_ops.append(cls.__name__)
@@ -175,7 +178,7 @@ class MultiscaleTestResize(BaseOperator):
         base_name_list = ['image']
         origin_ims['image'] = im
         if self.use_flip:
-            sample['flip_image'] = im[:, ::-1, :]
+            sample['flip_image'] = cv2.flip(im, 1)
             base_name_list.append('flip_image')
             origin_ims['flip_image'] = sample['flip_image']
         im_info = []
@@ -239,7 +242,9 @@ class ResizeImage(BaseOperator):
             max_size (int): the max size of image
             interp (int): the interpolation method
             use_cv2 (bool): use the cv2 interpolation method or use PIL 
-                interpolation method
+                interpolation method. The PIL path can be accelerated
+                without code changes by installing Pillow-SIMD in place
+                of Pillow (`pip uninstall pillow && pip install pillow-simd`)
         """
         super(ResizeImage, self).__init__()
         self.max_size = int(max_size)
@@ -295,7 +300,10 @@ class ResizeImage(BaseOperator):
             resize_w = selected_size
             resize_h = selected_size
 
-        if self.use_cv2:
+        if im_shape[0] == resize_h and im_shape[1] == resize_w:
+            # already in target size, no interpolation needed
+            pass
+        elif self.use_cv2:
             im = cv2.resize(
                 im,
                 None,
@@ -305,8 +313,17 @@ class ResizeImage(BaseOperator):
                 interpolation=self.interp)
         else:
             im = Image.fromarray(im)
-            im = im.resize((resize_w, resize_h), self.interp)
-            im = np.array(im)
+            resize_w, resize_h = int(resize_w), int(resize_h)
+            if hasattr(im, 'reduce'):
+                # Pillow >= 7.0: shrink by integer factors with the cheap
+                # box filter first, leaving at least 2x to the configured
+                # filter so the result stays close to plain resampling;
+                # Pillow itself skips this for NEAREST
+                im = im.resize(
+                    (resize_w, resize_h), self.interp, reducing_gap=2.0)
+            else:
+                im = im.resize((resize_w, resize_h), self.interp)
+            im = np.asarray(im)
 
         sample['image'] = im
         return sample
@@ -333,7 +350,7 @@ class RandomFlipImage(BaseOperator):
     def flip_segms(self, segms, height, width):
         def _flip_poly(poly, width):
             flipped_poly = np.array(poly)
-            flipped_poly[0::2] = width - np.array(poly[0::2]) - 1
+            flipped_poly[0::2] = width - flipped_poly[0::2] - 1
             return flipped_poly.tolist()
 
         def _flip_rle(rle, height, width):
@@ -380,17 +397,15 @@ class RandomFlipImage(BaseOperator):
             raise ImageError("{}: image is not 3-dimensional.".format(self))
         height, width, _ = im.shape
         if np.random.uniform(0, 1) < self.prob:
-            im = im[:, ::-1, :]
+            # contiguous copy rather than a negative stride view, which
+            # later operators would have to copy anyway
+            im = cv2.flip(im, 1)
             if gt_bbox.shape[0] == 0:
                 return sample
-            oldx1 = gt_bbox[:, 0].copy()
-            oldx2 = gt_bbox[:, 2].copy()
             if self.is_normalized:
-                gt_bbox[:, 0] = 1 - oldx2
-                gt_bbox[:, 2] = 1 - oldx1
+                gt_bbox[:, [0, 2]] = 1 - gt_bbox[:, [2, 0]]
             else:
-                gt_bbox[:, 0] = width - oldx2 - 1
-                gt_bbox[:, 2] = width - oldx1 - 1
+                gt_bbox[:, [0, 2]] = width - gt_bbox[:, [2, 0]] - 1
             if gt_bbox.shape[0] != 0 and (gt_bbox[:, 2] < gt_bbox[:, 0]).all():
                 m = "{}: invalid box, x2 should be greater than x1".format(self)
                 raise BboxError(m)
@@ -426,6 +441,17 @@ class NormalizeImage(BaseOperator):
         from functools import reduce
         if reduce(lambda x, y: x * y, self.std) == 0:
             raise ValueError('{}: std is invalid!'.format(self))
+        # fold scale, mean and std into one multiply-subtract:
+        # (im / 255 - mean) / std == im * scale - bias
+        inv_std = 1.0 / np.array(self.std, dtype=np.float64)
+        scale = inv_std / 255.0 if self.is_scale else inv_std
+        bias = np.array(self.mean, dtype=np.float64) * inv_std
+        if self.is_channel_first:
+            shape = (-1, 1, 1)
+        else:
+            shape = (1, 1, -1)
+        self._scale = scale.astype(np.float32).reshape(shape)
+        self._bias = bias.astype(np.float32).reshape(shape)
 
     def __call__(self, sample, context=None):
         """Normalize the image.
@@ -436,17 +462,8 @@ class NormalizeImage(BaseOperator):
         for k in sample.keys():
             if 'image' in k:
                 im = sample[k]
-                im = im.astype(np.float32, copy=False)
-                if self.is_channel_first:
-                    mean = np.array(self.mean)[:, np.newaxis, np.newaxis]
-                    std = np.array(self.std)[:, np.newaxis, np.newaxis]
-                else:
-                    mean = np.array(self.mean)[np.newaxis, np.newaxis, :]
-                    std = np.array(self.std)[np.newaxis, np.newaxis, :]
-                if self.is_scale:
-                    im = im / 255.0
-                im -= mean
-                im /= std
+                im = np.multiply(im, self._scale, dtype=np.float32)
+                im -= self._bias
                 sample[k] = im
         return sample
 
@@ -500,39 +517,92 @@ class RandomDistort(BaseOperator):
         self.hue_prob = hue_prob
         self.count = count
         self.is_order = is_order
+        # brightness, contrast and saturation are affine in RGB, each one
+        # below returns the composition of itself with the transform
+        # accumulated so far, the image is only touched when hue fires
+        # (HSV hue is not affine) and once at the end of __call__. So
+        # pixel values are clipped to [0, 255] only then, not after every
+        # step like chained ImageEnhance calls: highlights a later step
+        # pulls back into range are kept, and the mean used by contrast
+        # is not lowered by clipping. On bright images where brightness
+        # saturates many pixels this differs from the per step clipped
+        # result by several levels
+        self._gray_mix = np.tile(GRAY_COEF, (3, 1)).astype(np.float64)
+
+    def _affine_lut(self, img, alpha, beta):
+        """apply img * alpha + beta on an uint8 image by table lookup"""
+        # build the table with cv2.transform itself, so it rounds and
+        # saturates exactly like the general path in __call__
+        lut = cv2.transform(
+            np.arange(256, dtype=np.uint8).reshape(1, 256),
+            np.array([[alpha, beta]], dtype=np.float64))
+        return cv2.LUT(img, lut)
+
+    def _apply_affine(self, img, mat, bias):
+        """apply img * mat^T + bias in a single pass"""
+        scale = mat[0, 0]
+        if (mat == np.eye(3) * scale).all() and (bias == bias[0]).all():
+            if scale == 1. and bias[0] == 0.:
+                return img
+            if img.dtype == np.uint8:
+                # only brightness and contrast, same for all channels
+                return self._affine_lut(img, scale, bias[0])
+        # saturated for uint8 images
+        img = cv2.transform(img, np.hstack([mat, bias[:, np.newaxis]]))
+        if img.dtype != np.uint8:
+            np.clip(img, 0, 255, out=img)
+            img = img.astype(np.uint8)
+        return img
 
-    def random_brightness(self, img):
+    def random_brightness(self, img, mat, bias):
         brightness_delta = np.random.uniform(self.brightness_lower,
                                              self.brightness_upper)
         prob = np.random.uniform(0, 1)
         if prob < self.brightness_prob:
-            img = ImageEnhance.Brightness(img).enhance(brightness_delta)
-        return img
+            mat = mat * brightness_delta
+            bias = bias * brightness_delta
+        return img, mat, bias
 
-    def random_contrast(self, img):
+    def random_contrast(self, img, mat, bias):
         contrast_delta = np.random.uniform(self.contrast_lower,
                                            self.contrast_upper)
         prob = np.random.uniform(0, 1)
         if prob < self.contrast_prob:
-            img = ImageEnhance.Contrast(img).enhance(contrast_delta)
-        return img
-
-    def random_saturation(self, img):
+            # blend with the mean gray level, same as ImageEnhance.Contrast
+            mean = np.dot(mat, img.reshape(-1, 3).mean(axis=0)) + bias
+            gray_mean = np.dot(GRAY_COEF, mean)
+            mat = mat * contrast_delta
+            bias = bias * contrast_delta + gray_mean * (1 - contrast_delta)
+        return img, mat, bias
+
+    def random_saturation(self, img, mat, bias):
         saturation_delta = np.random.uniform(self.saturation_lower,
                                              self.saturation_upper)
         prob = np.random.uniform(0, 1)
         if prob < self.saturation_prob:
-            img = ImageEnhance.Color(img).enhance(saturation_delta)
-        return img
-
-    def random_hue(self, img):
+            # blend with the grayscale image, same as ImageEnhance.Color
+            t = saturation_delta * np.eye(3) \
+                + (1 - saturation_delta) * self._gray_mix
+            mat = np.dot(t, mat)
+            bias = np.dot(t, bias)
+        return img, mat, bias
+
+    def random_hue(self, img, mat, bias):
         hue_delta = np.random.uniform(self.hue_lower, self.hue_upper)
         prob = np.random.uniform(0, 1)
         if prob < self.hue_prob:
-            img = np.array(img.convert('HSV'))
-            img[:, :, 0] = img[:, :, 0] + hue_delta
-            img = Image.fromarray(img, mode='HSV').convert('RGB')
-        return img
+            # flush the pending affine, then shift the hue channel by a
+            # table lookup, wrapping around like the uint8 hue of PIL HSV
+            img = self._apply_affine(img, mat, bias)
+            if img.dtype != np.uint8:
+                img = np.clip(img, 0, 255).astype(np.uint8)
+            img = cv2.cvtColor(img, cv2.COLOR_RGB2HSV_FULL)
+            lut = (np.arange(256) + hue_delta).astype(np.int64) % 256
+            img[:, :, 0] = lut.astype(np.uint8)[img[:, :, 0]]
+            img = cv2.cvtColor(img, cv2.COLOR_HSV2RGB_FULL)
+            mat = np.eye(3)
+            bias = np.zeros(3)
+        return img, mat, bias
 
     def __call__(self, sample, context):
         """random distort the image"""
@@ -553,11 +623,11 @@ class RandomDistort(BaseOperator):
             ops = random.sample(ops, self.count)
         assert 'image' in sample, "image data not found"
         im = sample['image']
-        im = Image.fromarray(im)
+        mat = np.eye(3)
+        bias = np.zeros(3)
         for id in range(self.count):
-            im = ops[id](im)
-        im = np.asarray(im)
-        sample['image'] = im
+            im, mat, bias = ops[id](im, mat, bias)
+        sample['image'] = self._apply_affine(im, mat, bias)
         return sample
 
 
@@ -607,12 +677,21 @@ class ExpandImage(BaseOperator):
                     -w_off / im_width, -h_off / im_height,
                     (width - w_off) / im_width, (height - h_off) / im_height
                 ]
-                expand_im = np.ones((height, width, 3))
-                expand_im = np.uint8(expand_im * np.squeeze(self.mean))
-                expand_im = Image.fromarray(expand_im)
-                im = Image.fromarray(im)
-                expand_im.paste(im, (int(w_off), int(h_off)))
-                expand_im = np.asarray(expand_im)
+                # pad the image with the mean in a single pass instead of
+                # filling a new canvas and pasting the image onto it
+                fill = np.uint8(np.ones(3) * np.squeeze(self.mean)).tolist()
+                top, left = int(h_off), int(w_off)
+                # sample['h'] / sample['w'] may disagree with the decoded
+                # image, clip it to the canvas as Image.paste used to
+                im = im[:height - top, :width - left]
+                expand_im = cv2.copyMakeBorder(
+                    im,
+                    top,
+                    height - top - im.shape[0],
+                    left,
+                    width - left - im.shape[1],
+                    cv2.BORDER_CONSTANT,
+                    value=fill)
                 gt_bbox, gt_class, _ = filter_and_process(expand_bbox, gt_bbox,
                                                           gt_class)
                 sample['image'] = expand_im
@@ -671,17 +750,15 @@ class CropImage(BaseOperator):
         if 'gt_score' in sample:
             gt_score = sample['gt_score']
         sampled_bbox = []
-        gt_bbox = gt_bbox.tolist()
         for sampler in self.batch_sampler:
-            found = 0
-            for i in range(sampler[1]):
-                if found >= sampler[0]:
-                    break
-                sample_bbox = generate_sample_bbox(sampler)
-                if satisfy_sample_constraint(sampler, sample_bbox, gt_bbox,
-                                             self.satisfy_all):
-                    sampled_bbox.append(sample_bbox)
-                    found = found + 1
+            # draw all trials at once and keep the first max sample
+            # ones satisfying the constraint
+            sample_bboxes = generate_sample_bboxes(sampler, sampler[1])
+            satisfied = satisfy_sample_constraints(
+                sampler, sample_bboxes, gt_bbox, self.satisfy_all)
+            sampled_bbox.extend(
+                sample_bboxes[satisfied][:sampler[0]].tolist())
+        gt_bbox = gt_bbox.tolist()
         im = np.array(im)
         while sampled_bbox:
             idx = int(np.random.uniform(0, len(sampled_bbox)))
@@ -861,11 +938,8 @@ class NormalizeBox(BaseOperator):
         gt_bbox = sample['gt_bbox']
         width = sample['w']
         height = sample['h']
-        for i in range(gt_bbox.shape[0]):
-            gt_bbox[i][0] = gt_bbox[i][0] / width
-            gt_bbox[i][1] = gt_bbox[i][1] / height
-            gt_bbox[i][2] = gt_bbox[i][2] / width
-            gt_bbox[i][3] = gt_bbox[i][3] / height
+        gt_bbox[:, 0::2] /= width
+        gt_bbox[:, 1::2] /= height
         sample['gt_bbox'] = gt_bbox
         return sample
 
@@ -893,9 +967,12 @@ class Permute(BaseOperator):
             if 'image' in k:
                 im = sample[k]
                 if self.channel_first:
-                    im = np.swapaxes(im, 1, 2)
-                    im = np.swapaxes(im, 1, 0)
-                if self.to_bgr:
+                    im = im.transpose((2, 0, 1))
+                    if self.to_bgr:
+                        # single copy for both the permute and the
+                        # channel swap
+                        im = np.ascontiguousarray(im[::-1])
+                elif self.to_bgr:
                     im = im[[2, 1, 0], :, :]
                 sample[k] = im
         return sample
@@ -903,15 +980,18 @@ class Permute(BaseOperator):
 
 @register_op
 class MixupImage(BaseOperator):
-    def __init__(self, alpha=1.5, beta=1.5):
+    def __init__(self, alpha=1.5, beta=1.5, eps=1e-3):
         """ Mixup image and gt_bbbox/gt_score
         Args:
             alpha (float): alpha parameter of beta distribute
             beta (float): beta parameter of beta distribute
+            eps (float): skip mixup and keep only one of the samples
+                when the mixup factor is within eps of 0 or 1
         """
         super(MixupImage, self).__init__()
         self.alpha = alpha
         self.beta = beta
+        self.eps = eps
         if self.alpha <= 0.0:
             raise ValueError("alpha shold be positive in {}".format(self))
         if self.beta <= 0.0:
@@ -920,22 +1000,25 @@ class MixupImage(BaseOperator):
     def _mixup_img(self, img1, img2, factor):
         h = max(img1.shape[0], img2.shape[0])
         w = max(img1.shape[1], img2.shape[1])
-        img = np.zeros((h, w, img1.shape[2]), 'float32')
-        img[:img1.shape[0], :img1.shape[1], :] = \
-            img1.astype('float32') * factor
-        img[:img2.shape[0], :img2.shape[1], :] += \
-            img2.astype('float32') * (1.0 - factor)
-        return img.astype('uint8')
+        # zero pad to the common size (usually a no-op), then blend in
+        # one pass straight to uint8
+        if img1.shape[:2] != (h, w):
+            img1 = cv2.copyMakeBorder(img1, 0, h - img1.shape[0], 0,
+                                      w - img1.shape[1], cv2.BORDER_CONSTANT)
+        if img2.shape[:2] != (h, w):
+            img2 = cv2.copyMakeBorder(img2, 0, h - img2.shape[0], 0,
+                                      w - img2.shape[1], cv2.BORDER_CONSTANT)
+        return cv2.addWeighted(img1, factor, img2, 1.0 - factor, 0)
 
     def __call__(self, sample, context=None):
         if 'mixup' not in sample:
             return sample
         factor = np.random.beta(self.alpha, self.beta)
         factor = max(0.0, min(1.0, factor))
-        if factor >= 1.0:
+        if factor >= 1.0 - self.eps:
             sample.pop('mixup')
             return sample
-        if factor <= 0.0:
+        if factor <= self.eps:
             return sample['mixup']
         im = self._mixup_img(sample['image'], sample['mixup']['image'], factor)
         gt_bbox1 = sample['gt_bbox']
@@ -54,18 +54,21 @@ def build_post_map(coarsest_stride=1,
     def padding_minibatch(batch_data):
         if len(batch_data) == 1 and coarsest_stride == 1:
             return batch_data
-        max_shape = np.array([data[0].shape for data in batch_data]).max(axis=0)
+        shapes = np.array([data[0].shape for data in batch_data])
+        max_shape = shapes.max(axis=0)
         if coarsest_stride > 1:
             max_shape[1] = int(
                 np.ceil(max_shape[1] / coarsest_stride) * coarsest_stride)
             max_shape[2] = int(
                 np.ceil(max_shape[2] / coarsest_stride) * coarsest_stride)
         padding_batch = []
-        for data in batch_data:
-            im_c, im_h, im_w = data[0].shape[:]
-            padding_im = np.zeros(
+        for data, (im_c, im_h, im_w) in zip(batch_data, shapes):
+            # only zero the padded strips, the rest is overwritten anyway
+            padding_im = np.empty(
                 (im_c, max_shape[1], max_shape[2]), dtype=np.float32)
             padding_im[:, :im_h, :im_w] = data[0]
+            padding_im[:, im_h:, :] = 0
+            padding_im[:, :im_h, im_w:] = 0
             if use_padded_im_info:
                 data[1][:2] = max_shape[1:3]
             padding_batch.append((padding_im, ) + data[1:])
@@ -87,9 +90,11 @@ def build_post_map(coarsest_stride=1,
                         np.ceil(im_h / coarsest_stride) * coarsest_stride)
                     max_w = int(
                         np.ceil(im_w / coarsest_stride) * coarsest_stride)
-                    padding_im = np.zeros(
+                    padding_im = np.empty(
                         (im_c, max_h, max_w), dtype=np.float32)
                     padding_im[:, :im_h, :im_w] = input
+                    padding_im[:, im_h:, :] = 0
+                    padding_im[:, :im_h, im_w:] = 0
                     data[num_scale][3 * i:3 * i + 2] = [max_h, max_w]
                     padding_batch.append(padding_im)
                 else:
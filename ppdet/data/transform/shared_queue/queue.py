@@ -86,6 +86,10 @@ class SharedQueue(Queue):
         try:
             buff = super(SharedQueue, self).get(**kwargs)
             data = buff.get()
+            if six.PY3:
+                # unpickle straight from the shared memory view instead of
+                # copying the whole payload into a stream first
+                return pickle.loads(memoryview(data))
             return pickle.load(StringIO(data))
         except Exception as e:
             stack_info = traceback.format_exc()
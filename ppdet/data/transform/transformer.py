@@ -18,7 +18,10 @@ from __future__ import print_function
 
 import numpy as np
 import functools
-import collections
+try:
+    from collections.abc import Sequence
+except ImportError:
+    from collections import Sequence
 from ..dataset import Dataset
 
 
@@ -58,6 +61,17 @@ class MappedDataset(ProxiedDataset):
         return self._mapper(sample)
 
 
+def _empty_checker(kind):
+    """resolve how to tell whether a field of type 'kind' is empty"""
+    if kind is type(None):
+        return lambda x: True
+    if issubclass(kind, np.ndarray):
+        return lambda x: x.size == 0
+    if issubclass(kind, Sequence):
+        return lambda x: len(x) == 0
+    return lambda x: False
+
+
 class BatchedDataset(ProxiedDataset):
     """
     Batching samples
@@ -74,23 +88,21 @@ class BatchedDataset(ProxiedDataset):
         self._batchsz = batchsize
         self._drop_last = drop_last
         self._drop_empty = drop_empty
+        # field types are fixed by the arrange operator, so the empty
+        # check is resolved once per type instead of per field and sample
+        self._empty_checkers = {}
 
     def next(self):
         """proxy to self._ds.next"""
-
-        def empty(x):
-            if isinstance(x, np.ndarray) and x.size == 0:
-                return True
-            elif isinstance(x, collections.Sequence) and len(x) == 0:
-                return True
-            else:
-                return False
+        checkers = self._empty_checkers
 
         def has_empty(items):
-            if any(x is None for x in items):
-                return True
-            if any(empty(x) for x in items):
-                return True
+            for x in items:
+                kind = type(x)
+                if kind not in checkers:
+                    checkers[kind] = _empty_checker(kind)
+                if checkers[kind](x):
+                    return True
             return False
 
         batch = []